@@ -3,7 +3,10 @@ import os
 import logging
 import tempfile
 import json
+import shutil
+import zipfile
 import requests
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
 from cryptography.fernet import Fernet
 from http import HTTPStatus
@@ -24,6 +27,21 @@ INSTRUCTION_IMAGE_FILE = os.path.join(INSTRUCTION_FOLDER, 'instruction.jpg')
 USER_TOKENS_FILE = 'user_tokens.json'
 CIPHER_SUITE = Fernet(ENCRYPTION_KEY)
 
+# Параметры параллельной работы с папками
+YANDEX_DISK_API_URL = 'https://cloud-api.yandex.net/v1/disk/resources'
+MAX_WORKERS = 8
+PAGE_LIMIT = 100
+REQUEST_TIMEOUT = 30
+TRANSFER_TIMEOUT = (30, 300)
+
+# Ограничения на распаковку ZIP-архивов
+MAX_ZIP_ENTRIES = 1000
+MAX_ZIP_SIZE = 1024 * 1024 * 1024
+
+# Ограничения на скачивание папок (Telegram не принимает от бота файлы больше 50 МБ)
+MAX_DOWNLOAD_FILES = 1000
+MAX_DOWNLOAD_SIZE = 50 * 1024 * 1024
+
 # Настройка логгера
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -170,6 +188,284 @@ def download_file_from_yandex_disk(file_name, token):
         return None
 
 
+def create_session(token):
+    """Создание сессии с пулом соединений под параллельные запросы."""
+    session = requests.Session()
+    session.headers.update({'Authorization': f'OAuth {token}'})
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=MAX_WORKERS,
+        pool_maxsize=MAX_WORKERS
+    )
+    session.mount('https://', adapter)
+    return session
+
+
+def normalize_disk_path(path):
+    """Приведение пути на Яндекс Диске к виду /папка/файл."""
+    if path.startswith('disk:'):
+        path = path[len('disk:'):]
+    return '/' + path.strip().strip('/')
+
+
+def create_folder_on_yandex_disk(session, folder_path):
+    """Создание одной папки на Яндекс Диске."""
+    try:
+        response = session.put(
+            YANDEX_DISK_API_URL,
+            params={'path': folder_path},
+            timeout=REQUEST_TIMEOUT
+        )
+        if response.status_code == 201:
+            return True
+        # 409 возвращается и для существующей папки, и когда по пути лежит
+        # файл или нет родительской папки - успехом считаем только первое
+        if response.status_code == 409:
+            return response.json().get('error') == 'DiskPathPointsToExistentDirectoryError'
+        return False
+    except (requests.RequestException, ValueError) as e:
+        logger.error(f'Error creating folder "{folder_path}": {str(e)}')
+        return False
+
+
+def create_folders_on_yandex_disk(session, folder_paths):
+    """Создание дерева папок на Яндекс Диске.
+
+    Папки создаются пачками по уровням вложенности: все папки одного уровня
+    создаются параллельно, следующий уровень - после того, как готов текущий.
+    """
+    levels = {}
+    for folder_path in set(map(normalize_disk_path, folder_paths)):
+        if folder_path != '/':
+            levels.setdefault(folder_path.count('/'), []).append(folder_path)
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for depth in sorted(levels):
+            results = executor.map(
+                lambda path: create_folder_on_yandex_disk(session, path),
+                levels[depth]
+            )
+            if not all(results):
+                logger.info(f'Error creating folders at depth {depth}')
+                return False
+    return True
+
+
+def upload_file_to_path(session, file_path, disk_path):
+    """Загрузка локального файла по указанному пути на Яндекс Диске."""
+    try:
+        response = session.get(
+            f'{YANDEX_DISK_API_URL}/upload',
+            params={'path': disk_path, 'overwrite': 'true'},
+            timeout=REQUEST_TIMEOUT
+        )
+        if response.status_code != 200:
+            return False
+        with open(file_path, 'rb') as f:
+            upload_response = requests.put(
+                response.json()['href'],
+                data=f,
+                timeout=TRANSFER_TIMEOUT
+            )
+        return upload_response.status_code in (201, 202)
+    except (requests.RequestException, OSError) as e:
+        logger.error(f'Error uploading file "{disk_path}": {str(e)}')
+        return False
+
+
+def upload_folder_to_yandex_disk(local_folder, disk_folder, token):
+    """Загрузка локальной папки на Яндекс Диск с сохранением структуры."""
+    disk_folder = normalize_disk_path(disk_folder)
+    folders = [disk_folder]
+    files = []
+    for root, _, file_names in os.walk(local_folder):
+        relative_root = os.path.relpath(root, local_folder).replace(os.sep, '/')
+        disk_root = disk_folder if relative_root == '.' else f'{disk_folder}/{relative_root}'
+        folders.append(disk_root)
+        for file_name in file_names:
+            files.append((
+                os.path.join(root, file_name),
+                normalize_disk_path(f'{disk_root}/{file_name}')
+            ))
+
+    session = create_session(token)
+    if not create_folders_on_yandex_disk(session, folders):
+        return 'Ошибка при создании папок на Яндекс.Диске.'
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = list(executor.map(
+            lambda file: upload_file_to_path(session, *file),
+            files
+        ))
+
+    failed = results.count(False)
+    logger.info(
+        f'Folder "{disk_folder}" uploaded to Yandex.Disk: '
+        f'{len(files) - failed} of {len(files)} files'
+    )
+    if failed:
+        return f'Папка "{disk_folder}" загружена на Яндекс.Диск с ошибками: не загружено файлов - {failed} из {len(files)}.'
+    return f'Папка "{disk_folder}" успешно загружена на Яндекс.Диск! Файлов: {len(files)}.'
+
+
+def upload_zip_to_yandex_disk(zip_path, folder_name, token):
+    """Распаковка ZIP-архива в папку на Яндекс Диске."""
+    if not zipfile.is_zipfile(zip_path):
+        return 'Файл не является ZIP-архивом.'
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with zipfile.ZipFile(zip_path) as archive:
+            entries = archive.infolist()
+            total_size = sum(info.file_size for info in entries)
+            if len(entries) > MAX_ZIP_ENTRIES or total_size > MAX_ZIP_SIZE:
+                logger.info(f'ZIP archive "{folder_name}" rejected: {len(entries)} entries, {total_size} bytes')
+                return (
+                    f'Архив слишком большой: допускается не более {MAX_ZIP_ENTRIES} файлов '
+                    f'и {MAX_ZIP_SIZE // (1024 * 1024)} МБ после распаковки.'
+                )
+            for info in entries:
+                # Архиваторы Windows пишут кириллицу в cp866 без флага UTF-8
+                if not info.flag_bits & 0x800:
+                    try:
+                        info.filename = info.filename.encode('cp437').decode('cp866')
+                    except UnicodeError:
+                        pass
+                archive.extract(info, temp_dir)
+        return upload_folder_to_yandex_disk(temp_dir, folder_name, token)
+
+
+def get_folder_page(session, folder_path, offset):
+    """Получение одной страницы содержимого папки на Яндекс Диске."""
+    params = {
+        'path': folder_path,
+        'limit': PAGE_LIMIT,
+        'offset': offset,
+        'fields': '_embedded.items.path,_embedded.items.type,_embedded.items.size,_embedded.total',
+    }
+    try:
+        response = session.get(
+            YANDEX_DISK_API_URL,
+            params=params,
+            timeout=REQUEST_TIMEOUT
+        )
+        if response.status_code != 200:
+            logger.info(f'Error {response.status_code} while listing folder "{folder_path}"')
+            return folder_path, offset, None
+        # У файла нет вложенного содержимого
+        return folder_path, offset, response.json().get('_embedded')
+    except (requests.RequestException, ValueError) as e:
+        logger.error(f'Error listing folder "{folder_path}": {str(e)}')
+        return folder_path, offset, None
+
+
+def walk_yandex_disk_folder(session, folder_path):
+    """Обход дерева папки на Яндекс Диске в ширину.
+
+    Страницы всех найденных папок запрашиваются параллельно, поэтому
+    скорость обхода ограничена числом соединений, а не числом файлов.
+    Возвращает список путей вложенных папок и список пар (путь, размер)
+    для файлов или None при ошибке.
+    """
+    folders = []
+    files = []
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        pending = {executor.submit(
+            get_folder_page, session, normalize_disk_path(folder_path), 0
+        )}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, offset, embedded = future.result()
+                if embedded is None:
+                    for pending_future in pending:
+                        pending_future.cancel()
+                    return None
+                if offset == 0:
+                    for next_offset in range(PAGE_LIMIT, embedded['total'], PAGE_LIMIT):
+                        pending.add(executor.submit(
+                            get_folder_page, session, path, next_offset
+                        ))
+                for item in embedded['items']:
+                    item_path = normalize_disk_path(item['path'])
+                    if item['type'] == 'dir':
+                        folders.append(item_path)
+                        pending.add(executor.submit(
+                            get_folder_page, session, item_path, 0
+                        ))
+                    else:
+                        files.append((item_path, item.get('size', 0)))
+    return folders, files
+
+
+def download_file_to_path(session, disk_path, file_path):
+    """Скачивание файла с Яндекс Диска в локальный файл."""
+    try:
+        response = session.get(
+            f'{YANDEX_DISK_API_URL}/download',
+            params={'path': disk_path},
+            timeout=REQUEST_TIMEOUT
+        )
+        if response.status_code != 200:
+            return False
+        download_url = response.json()['href']
+        with requests.get(download_url, stream=True, timeout=TRANSFER_TIMEOUT) as download_response:
+            if download_response.status_code != 200:
+                return False
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, 'wb') as f:
+                for chunk in download_response.iter_content(chunk_size=1024 * 1024):
+                    f.write(chunk)
+        return True
+    except (requests.RequestException, OSError) as e:
+        logger.error(f'Error downloading file "{disk_path}": {str(e)}')
+        return False
+
+
+def download_folder_from_yandex_disk(disk_folder, local_folder, token):
+    """Зеркалирование папки с Яндекс Диска в локальную папку.
+
+    Возвращает число скачанных файлов и сообщение об ошибке (None при успехе).
+    """
+    disk_folder = normalize_disk_path(disk_folder)
+    session = create_session(token)
+    tree = walk_yandex_disk_folder(session, disk_folder)
+    if tree is None:
+        return 0, f'Папка "{disk_folder}" не найдена на Яндекс.Диске или не может быть скачана.'
+    folders, files = tree
+
+    total_size = sum(size for _, size in files)
+    if len(files) > MAX_DOWNLOAD_FILES or total_size > MAX_DOWNLOAD_SIZE:
+        logger.info(f'Folder "{disk_folder}" rejected: {len(files)} files, {total_size} bytes')
+        return 0, (
+            f'Папка слишком большая: допускается не более {MAX_DOWNLOAD_FILES} файлов '
+            f'и {MAX_DOWNLOAD_SIZE // (1024 * 1024)} МБ.'
+        )
+    if not files:
+        return 0, f'Папка "{disk_folder}" пуста.'
+
+    prefix = '' if disk_folder == '/' else disk_folder
+
+    def local_path(disk_path):
+        return os.path.join(local_folder, *disk_path[len(prefix):].strip('/').split('/'))
+
+    os.makedirs(local_folder, exist_ok=True)
+    for folder in folders:
+        os.makedirs(local_path(folder), exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = list(executor.map(
+            lambda file: download_file_to_path(session, file[0], local_path(file[0])),
+            files
+        ))
+
+    failed = results.count(False)
+    logger.info(
+        f'Folder "{disk_folder}" downloaded from Yandex.Disk: '
+        f'{len(files) - failed} of {len(files)} files'
+    )
+    if failed:
+        return len(files) - failed, f'Папка "{disk_folder}" скачана с ошибками: не скачано файлов - {failed} из {len(files)}.'
+    return len(files), None
+
+
 def process_download_file(message):
     """Обработка скачивания файла."""
     user_id = str(message.from_user.id)
@@ -195,6 +491,38 @@ def process_download_file(message):
         logger.error(f'Произошла ошибка при скачивании файла: {str(e)}')
 
 
+def process_download_folder(message):
+    """Обработка скачивания папки."""
+    user_id = str(message.from_user.id)
+    token = user_tokens.get(user_id)
+    if not token:
+        bot.reply_to(message, 'Сначала отправьте свой токен с помощью команды /token.')
+        return
+
+    try:
+        folder_name = message.text.strip()
+        bot.reply_to(message, 'Скачивание папки займёт некоторое время, я вам сообщу, как всё будет готово!')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            local_folder = os.path.join(temp_dir, 'folder')
+            files_count, status_message = download_folder_from_yandex_disk(folder_name, local_folder, token)
+            if status_message:
+                bot.reply_to(message, status_message)
+            if not files_count:
+                return
+            archive_name = os.path.basename(folder_name.strip('/')) or 'disk'
+            archive_path = shutil.make_archive(
+                os.path.join(temp_dir, archive_name),
+                'zip',
+                local_folder
+            )
+            with open(archive_path, 'rb') as f:
+                bot.send_document(message.chat.id, f)
+
+    except Exception as e:
+        bot.reply_to(message, f'Произошла ошибка: {str(e)}')
+        logger.error(f'Произошла ошибка при скачивании папки: {str(e)}')
+
+
 def update_keyboard(chat_id):
     """Обновление клавиатуры для пользователя."""
     user_id = str(chat_id)
@@ -207,6 +535,7 @@ def update_keyboard(chat_id):
         markup.add(
             telebot.types.KeyboardButton('Список моих файлов'),
             telebot.types.KeyboardButton('Скачать файл с диска'),
+            telebot.types.KeyboardButton('Скачать папку с диска'),
             telebot.types.KeyboardButton('Загрузить файл на диск'),
             telebot.types.KeyboardButton('Удалить файл с диска'),
             telebot.types.KeyboardButton('Объем хранилища'),
@@ -268,7 +597,12 @@ def handle_file(message, file_info, file_name, token):
         with tempfile.NamedTemporaryFile(delete=False) as temp_file:
             temp_file.write(file)
             file_path = temp_file.name
-        status_message = upload_to_yandex_disk(file_path, file_name, token)
+        if file_name.lower().endswith('.zip'):
+            bot.reply_to(message, 'Распаковываю архив в папку на Яндекс.Диске, это может занять некоторое время.')
+            folder_name = file_name[:-len('.zip')].strip() or 'archive'
+            status_message = upload_zip_to_yandex_disk(file_path, folder_name, token)
+        else:
+            status_message = upload_to_yandex_disk(file_path, file_name, token)
         bot.reply_to(message, status_message)
 
     except Exception as e:
@@ -377,6 +711,7 @@ def display_help(message):
     """Обработка /help."""
     help_message = '''
     Чтобы загрузить файл на Диск, просто отправьте его боту.
+    ZIP-архив будет распакован в папку с именем архива.
     Список доступных команд:
     /start - начать общение с ботом
     /help или "Помощь" - показать список доступных команд
@@ -384,6 +719,7 @@ def display_help(message):
     /delete_file или "Удалить файл с диска" - удалить файл с Яндекс.Диска
     /list_files или "Список моих файлов" - показать список файлов на Яндекс.Диске
     /download_file или "Скачать файл с диска" - скачать файл с Яндекс.Диска
+    /download_folder или "Скачать папку с диска" - скачать папку с Яндекс.Диска архивом
     /get_info или "Объем хранилища' - узнать информацию об объеме памяти вашего диска
     /get_token_instruction или "Как получить токен" - инструкция по получению токена Яндекс ID
     /clean_disk или "Очистить диск" - удаление всех файлов с Яндекс Диска
@@ -517,6 +853,14 @@ def download_file(message):
     bot.register_next_step_handler(message, process_download_file)
 
 
+@bot.message_handler(func=lambda message: message.text == 'Скачать папку с диска')
+@bot.message_handler(commands=['download_folder'])
+def download_folder(message):
+    """Обработка /download_folder."""
+    bot.reply_to(message, 'Напишите путь к папке для скачивания.')
+    bot.register_next_step_handler(message, process_download_folder)
+
+
 @bot.message_handler(func=lambda message: message.text == 'Удалить файл с диска')
 @bot.message_handler(commands=['delete_file'])
 def delete_file(message):
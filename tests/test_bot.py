@@ -1,16 +1,30 @@
 import sys
 import os
+import zipfile
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '')))
 import pytest
+import requests
 from unittest.mock import Mock, patch
 import tempfile
-from bot import (
+from cryptography.fernet import Fernet
+
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123456:TEST')
+os.environ.setdefault('ENCRYPTION_KEY', Fernet.generate_key().decode())
+
+import main
+from main import (
     delete_from_yandex_disk,
     download_file_from_yandex_disk,
     get_files_list,
     upload_to_yandex_disk,
     check_token_validity,
     get_disk_quota,
+    create_folders_on_yandex_disk,
+    walk_yandex_disk_folder,
+    upload_folder_to_yandex_disk,
+    upload_zip_to_yandex_disk,
+    download_folder_from_yandex_disk,
+    handle_file,
 )
 
 
@@ -39,7 +53,7 @@ def test_download_file_from_yandex_disk():
         mock_get.return_value.content = b'Test file content'
 
         file_content = download_file_from_yandex_disk(file_name, token)
-        assert file_content == b'Test file content'
+        assert file_content == (b'Test file content', file_name)
 
 
 def test_get_files_list():
@@ -99,3 +113,246 @@ def test_get_disk_quota():
         total_space, used_space = get_disk_quota(token)
         assert total_space == 100.0
         assert used_space == 10.0
+
+
+def make_listing_response(items, total=None):
+    response = Mock()
+    response.status_code = 200
+    response.json.return_value = {
+        '_embedded': {'items': items, 'total': len(items) if total is None else total}
+    }
+    return response
+
+
+def test_create_folders_on_yandex_disk():
+    session = Mock()
+    session.put.return_value.status_code = 201
+    assert create_folders_on_yandex_disk(session, ['/a/b', '/a', 'a/b/c/'])
+    created = [call.kwargs['params']['path'] for call in session.put.call_args_list]
+    assert sorted(created) == ['/a', '/a/b', '/a/b/c']
+    assert created.index('/a') < created.index('/a/b') < created.index('/a/b/c')
+
+
+def test_walk_yandex_disk_folder():
+    pages = {
+        '/folder': [{'path': 'disk:/folder/file1.txt', 'type': 'file', 'size': 10},
+                    {'path': 'disk:/folder/sub', 'type': 'dir'}],
+        '/folder/sub': [{'path': 'disk:/folder/sub/file2.txt', 'type': 'file', 'size': 20}],
+    }
+
+    def mock_get(url, params, timeout):
+        return make_listing_response(pages[params['path']])
+
+    session = Mock()
+    session.get.side_effect = mock_get
+    folders, files = walk_yandex_disk_folder(session, 'folder')
+    assert folders == ['/folder/sub']
+    assert sorted(files) == [('/folder/file1.txt', 10), ('/folder/sub/file2.txt', 20)]
+
+
+def test_create_folders_on_yandex_disk_conflict():
+    session = Mock()
+    session.put.return_value.status_code = 409
+    session.put.return_value.json.return_value = {'error': 'DiskPathPointsToExistentDirectoryError'}
+    assert create_folders_on_yandex_disk(session, ['/a'])
+
+    session.put.return_value.json.return_value = {'error': 'DiskPathDoesntExistsError'}
+    assert not create_folders_on_yandex_disk(session, ['/a'])
+
+
+def test_walk_yandex_disk_folder_pagination():
+    items = [{'path': f'disk:/folder/file{i}.txt', 'type': 'file'} for i in range(5)]
+
+    def mock_get(url, params, timeout):
+        offset = params['offset']
+        return make_listing_response(items[offset:offset + params['limit']], total=len(items))
+
+    session = Mock()
+    session.get.side_effect = mock_get
+    with patch.object(main, 'PAGE_LIMIT', 2):
+        folders, files = walk_yandex_disk_folder(session, '/folder')
+    assert folders == []
+    assert sorted(path for path, _ in files) == sorted(item['path'][len('disk:'):] for item in items)
+    assert sorted(call.kwargs['params']['offset'] for call in session.get.call_args_list) == [0, 2, 4]
+
+
+def test_walk_yandex_disk_folder_errors():
+    session = Mock()
+    session.get.return_value.status_code = 404
+    assert walk_yandex_disk_folder(session, '/missing') is None
+
+    # Путь указывает на файл - в ответе нет _embedded
+    session.get.return_value.status_code = 200
+    session.get.return_value.json.return_value = {'path': 'disk:/f.txt', 'type': 'file'}
+    assert walk_yandex_disk_folder(session, '/f.txt') is None
+
+    session.get.side_effect = requests.ConnectionError('reset')
+    assert walk_yandex_disk_folder(session, '/folder') is None
+
+
+def test_upload_folder_to_yandex_disk_partial_failure():
+    with tempfile.TemporaryDirectory() as local_folder:
+        os.makedirs(os.path.join(local_folder, 'sub'))
+        for name in ('a.txt', os.path.join('sub', 'b.txt')):
+            with open(os.path.join(local_folder, name), 'w') as f:
+                f.write('data')
+
+        session = Mock()
+        session.put.return_value.status_code = 201
+        session.get.return_value.status_code = 200
+        session.get.return_value.json.return_value = {'href': 'mock_upload_link'}
+        with patch('main.create_session', return_value=session), \
+                patch('requests.put') as mock_put:
+            mock_put.side_effect = [requests.ConnectionError('reset'), Mock(status_code=201)]
+            status_message = upload_folder_to_yandex_disk(local_folder, 'folder', 'mock_token')
+
+    assert 'не загружено файлов - 1 из 2' in status_message
+    created = [call.kwargs['params']['path'] for call in session.put.call_args_list]
+    assert sorted(created) == ['/folder', '/folder/sub']
+
+
+def test_upload_zip_to_yandex_disk():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        zip_path = os.path.join(temp_dir, 'archive.zip')
+        with zipfile.ZipFile(zip_path, 'w') as archive:
+            archive.writestr('docs/readme.txt', 'data')
+            archive.writestr('empty/', '')
+
+        with patch('main.upload_folder_to_yandex_disk', return_value='ok') as mock_upload:
+            def check_tree(local_folder, folder_name, token):
+                assert os.path.isfile(os.path.join(local_folder, 'docs', 'readme.txt'))
+                assert os.path.isdir(os.path.join(local_folder, 'empty'))
+                return 'ok'
+            mock_upload.side_effect = check_tree
+            assert upload_zip_to_yandex_disk(zip_path, 'archive', 'mock_token') == 'ok'
+            assert mock_upload.call_args.args[1:] == ('archive', 'mock_token')
+
+        with patch.object(main, 'MAX_ZIP_ENTRIES', 1):
+            assert 'слишком большой' in upload_zip_to_yandex_disk(zip_path, 'archive', 'mock_token')
+
+        with patch.object(main, 'MAX_ZIP_SIZE', 3), \
+                patch('main.upload_folder_to_yandex_disk') as mock_upload:
+            assert 'слишком большой' in upload_zip_to_yandex_disk(zip_path, 'archive', 'mock_token')
+            mock_upload.assert_not_called()
+
+        not_zip_path = os.path.join(temp_dir, 'fake.zip')
+        with open(not_zip_path, 'wb') as f:
+            f.write(b'not a zip')
+        assert 'не является zip' in upload_zip_to_yandex_disk(not_zip_path, 'fake', 'mock_token').lower()
+
+
+def test_upload_zip_to_yandex_disk_cp866_names():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        zip_path = os.path.join(temp_dir, 'archive.zip')
+        with zipfile.ZipFile(zip_path, 'w') as archive:
+            archive.writestr('XXXXX.txt', 'data')
+        # Имя в cp866 без флага UTF-8, как его пишут архиваторы Windows
+        with open(zip_path, 'rb') as f:
+            data = f.read().replace(b'XXXXX', 'отчёт'.encode('cp866'))
+        with open(zip_path, 'wb') as f:
+            f.write(data)
+
+        def check_tree(local_folder, folder_name, token):
+            assert os.listdir(local_folder) == ['отчёт.txt']
+            return 'ok'
+
+        with patch('main.upload_folder_to_yandex_disk', side_effect=check_tree):
+            assert upload_zip_to_yandex_disk(zip_path, 'archive', 'mock_token') == 'ok'
+
+
+def test_handle_file_zip(mock_message):
+    with patch('main.bot') as mock_bot, \
+            patch('main.upload_zip_to_yandex_disk', return_value='zip ok') as mock_zip, \
+            patch('main.upload_to_yandex_disk', return_value='file ok') as mock_file:
+        mock_bot.download_file.return_value = b'content'
+        handle_file(mock_message, Mock(), 'photos.zip', 'mock_token')
+        assert mock_zip.call_args.args[1:] == ('photos', 'mock_token')
+        handle_file(mock_message, Mock(), '.zip', 'mock_token')
+        assert mock_zip.call_args.args[1:] == ('archive', 'mock_token')
+        handle_file(mock_message, Mock(), 'photo.jpg', 'mock_token')
+
+    assert mock_file.call_args.args[1:] == ('photo.jpg', 'mock_token')
+    assert mock_bot.reply_to.call_args_list[-1].args[1] == 'file ok'
+
+
+def make_download_session(pages):
+    def mock_session_get(url, params, timeout):
+        if url.endswith('/download'):
+            response = Mock(status_code=200)
+            response.json.return_value = {'href': 'mock_download_link'}
+            return response
+        return make_listing_response(pages[params['path']])
+
+    session = Mock()
+    session.get.side_effect = mock_session_get
+    return session
+
+
+def make_download_response(content):
+    download_response = Mock(status_code=200)
+    download_response.iter_content.return_value = [content]
+    download_response.__enter__ = Mock(return_value=download_response)
+    download_response.__exit__ = Mock(return_value=False)
+    return download_response
+
+
+def test_download_folder_from_yandex_disk():
+    pages = {
+        '/folder': [{'path': 'disk:/folder/file1.txt', 'type': 'file', 'size': 12},
+                    {'path': 'disk:/folder/empty', 'type': 'dir'}],
+        '/folder/empty': [],
+    }
+    session = make_download_session(pages)
+
+    with tempfile.TemporaryDirectory() as local_folder, \
+            patch('main.create_session', return_value=session), \
+            patch('requests.get', return_value=make_download_response(b'Test content')):
+        assert download_folder_from_yandex_disk('folder', local_folder, 'mock_token') == (1, None)
+        with open(os.path.join(local_folder, 'file1.txt'), 'rb') as f:
+            assert f.read() == b'Test content'
+        assert os.path.isdir(os.path.join(local_folder, 'empty'))
+
+
+def test_download_folder_from_yandex_disk_limits():
+    pages = {
+        '/': [{'path': f'disk:/file{i}.bin', 'type': 'file', 'size': 30 * 1024 * 1024}
+              for i in range(2)],
+    }
+    session = make_download_session(pages)
+
+    with tempfile.TemporaryDirectory() as local_folder, \
+            patch('main.create_session', return_value=session), \
+            patch('requests.get') as mock_get:
+        files_count, status_message = download_folder_from_yandex_disk('/', local_folder, 'mock_token')
+        assert files_count == 0
+        assert 'слишком большая' in status_message
+        with patch.object(main, 'MAX_DOWNLOAD_SIZE', 100 * 1024 * 1024), \
+                patch.object(main, 'MAX_DOWNLOAD_FILES', 1):
+            files_count, status_message = download_folder_from_yandex_disk('/', local_folder, 'mock_token')
+            assert files_count == 0
+            assert 'слишком большая' in status_message
+        mock_get.assert_not_called()
+    assert not any(call.args[0].endswith('/download') for call in session.get.call_args_list)
+
+
+def test_download_folder_from_yandex_disk_errors():
+    session = Mock()
+    session.get.return_value.status_code = 404
+    with tempfile.TemporaryDirectory() as local_folder, \
+            patch('main.create_session', return_value=session):
+        files_count, status_message = download_folder_from_yandex_disk('missing', local_folder, 'mock_token')
+    assert files_count == 0
+    assert 'не найдена' in status_message
+
+    pages = {
+        '/folder': [{'path': 'disk:/folder/file1.txt', 'type': 'file', 'size': 4},
+                    {'path': 'disk:/folder/file2.txt', 'type': 'file', 'size': 4}],
+    }
+    session = make_download_session(pages)
+    with tempfile.TemporaryDirectory() as local_folder, \
+            patch('main.create_session', return_value=session), \
+            patch('requests.get') as mock_get:
+        mock_get.side_effect = [requests.ConnectionError('reset'), make_download_response(b'data')]
+        files_count, status_message = download_folder_from_yandex_disk('folder', local_folder, 'mock_token')
+    assert files_count == 1
+    assert 'не скачано файлов - 1 из 2' in status_message